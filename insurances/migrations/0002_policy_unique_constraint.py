@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurances', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='policy',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='policy',
+            constraint=models.UniqueConstraint(fields=('insured', 'insurer', 'policyholder', 'start_date'), name='unique_policy_per_insured_insurer_policyholder_start_date'),
+        ),
+    ]
@@ -0,0 +1,172 @@
+# Generated by Django 5.2 on 2026-10-15 10:03
+
+import django.db.models.deletion
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def number_policies(apps, schema_editor):
+    """Give every policy an integer id and record it on the rows that reference the policy."""
+    Policy = apps.get_model('insurances', 'Policy')
+    Plan = apps.get_model('insurances', 'Plan')
+    InsuredStatus = apps.get_model('insurances', 'InsuredStatus')
+    unique_ids = Policy.objects.order_by('created_at', 'unique_id').values_list('unique_id', flat=True)
+    for number, unique_id in enumerate(unique_ids, start=1):
+        Policy.objects.filter(unique_id=unique_id).update(id=number)
+        Plan.objects.filter(policy_id=unique_id).update(policy_ref=number)
+        InsuredStatus.objects.filter(policy_id=unique_id).update(policy_ref=number)
+
+
+def unnumber_policies(apps, schema_editor):
+    """Restore the varchar foreign keys from the unique_id saved by unlink_policies."""
+    Plan = apps.get_model('insurances', 'Plan')
+    InsuredStatus = apps.get_model('insurances', 'InsuredStatus')
+    Plan.objects.update(policy_id=models.F('policy_unique_id'))
+    InsuredStatus.objects.update(policy_id=models.F('policy_unique_id'))
+
+
+def reset_policy_ids(apps, schema_editor):
+    """
+    Move the id sequence past the renumbered rows.
+    PostgreSQL starts the new identity at 1, which the existing rows already use.
+    Other backends return no SQL here.
+    """
+    Policy = apps.get_model('insurances', 'Policy')
+    for sql in schema_editor.connection.ops.sequence_reset_sql(no_style(), [Policy]):
+        schema_editor.execute(sql)
+
+
+def link_policies(apps, schema_editor):
+    """Point the new integer foreign keys at the renumbered policies."""
+    Plan = apps.get_model('insurances', 'Plan')
+    InsuredStatus = apps.get_model('insurances', 'InsuredStatus')
+    Plan.objects.update(policy_id=models.F('policy_ref'))
+    InsuredStatus.objects.update(policy_id=models.F('policy_ref'))
+
+
+def unlink_policies(apps, schema_editor):
+    """
+    Save each referenced policy's unique_id next to the integer foreign key.
+    The integer ids do not survive reversing the primary key change on SQLite,
+    so unnumber_policies works from unique_id alone.
+    """
+    Policy = apps.get_model('insurances', 'Policy')
+    Plan = apps.get_model('insurances', 'Plan')
+    InsuredStatus = apps.get_model('insurances', 'InsuredStatus')
+    for number, unique_id in Policy.objects.values_list('id', 'unique_id'):
+        Plan.objects.filter(policy_id=number).update(policy_unique_id=unique_id)
+        InsuredStatus.objects.filter(policy_id=number).update(policy_unique_id=unique_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurances', '0002_policy_unique_constraint'),
+    ]
+
+    operations = [
+        # Stage the new integer key next to the old varchar one
+        migrations.AddField(
+            model_name='policy',
+            name='id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='policy_ref',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='insuredstatus',
+            name='policy_ref',
+            field=models.BigIntegerField(null=True),
+        ),
+        # Only filled when reversing, see unlink_policies
+        migrations.AddField(
+            model_name='plan',
+            name='policy_unique_id',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='insuredstatus',
+            name='policy_unique_id',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        # Nullable so that reversing can re-add the varchar foreign keys empty and
+        # let unnumber_policies fill them before they become required again
+        migrations.AlterField(
+            model_name='plan',
+            name='policy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.AlterField(
+            model_name='insuredstatus',
+            name='policy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='insured_statuses', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.RunPython(number_policies, unnumber_policies),
+        # Drop the varchar foreign keys before the primary key moves
+        migrations.RemoveField(
+            model_name='plan',
+            name='policy',
+        ),
+        migrations.RemoveField(
+            model_name='insuredstatus',
+            name='policy',
+        ),
+        migrations.AlterField(
+            model_name='policy',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.RunPython(reset_policy_ids, migrations.RunPython.noop),
+        # Unsetting a primary key keeps no uniqueness on the column, so add it back explicitly
+        migrations.AlterField(
+            model_name='policy',
+            name='unique_id',
+            field=models.CharField(max_length=50, verbose_name='Policy Unique ID'),
+        ),
+        migrations.AlterField(
+            model_name='policy',
+            name='unique_id',
+            field=models.CharField(max_length=50, unique=True, verbose_name='Policy Unique ID'),
+        ),
+        # Recreate the foreign keys as bigint columns
+        migrations.AddField(
+            model_name='plan',
+            name='policy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.AddField(
+            model_name='insuredstatus',
+            name='policy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='insured_statuses', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.RunPython(link_policies, unlink_policies),
+        migrations.AlterField(
+            model_name='plan',
+            name='policy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.AlterField(
+            model_name='insuredstatus',
+            name='policy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insured_statuses', to='insurances.policy', verbose_name='Policy'),
+        ),
+        migrations.RemoveField(
+            model_name='plan',
+            name='policy_ref',
+        ),
+        migrations.RemoveField(
+            model_name='insuredstatus',
+            name='policy_ref',
+        ),
+        migrations.RemoveField(
+            model_name='plan',
+            name='policy_unique_id',
+        ),
+        migrations.RemoveField(
+            model_name='insuredstatus',
+            name='policy_unique_id',
+        ),
+    ]
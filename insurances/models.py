@@ -63,7 +63,7 @@ class Policyholder(TimestampedModel):
 
 
 class Policy(TimestampedModel):
-    unique_id = models.CharField(max_length=50, primary_key=True, verbose_name=_('Policy Unique ID'))
+    unique_id = models.CharField(max_length=50, unique=True, verbose_name=_('Policy Unique ID'))
     insured = models.ForeignKey(
         Insured,
         on_delete=models.CASCADE,
@@ -82,7 +82,11 @@ class Policy(TimestampedModel):
     class Meta:
         verbose_name = _('Policy')
         verbose_name_plural = _('Policies')
-        unique_together = (('insured', 'insurer', 'policyholder', 'start_date'),)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['insured', 'insurer', 'policyholder', 'start_date'],
+                name='unique_policy_per_insured_insurer_policyholder_start_date'),
+        ]
 
     def __str__(self):
         return f"Policy {self.unique_id} for {self.insured}"
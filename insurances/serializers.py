@@ -1,7 +1,83 @@
+from collections import defaultdict
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.utils.translation import gettext_lazy as _
-from .models import Insured, Insurer, Policyholder, Policy, Plan, InsuredStatus
-from .services import BaseInsurerService, DefaultInsurerService, PasargadInsurerService, HekmatInsurerService
+from .services import (
+    DUPLICATE_ID, BaseInsurerService, DefaultInsurerService, PasargadInsurerService, HekmatInsurerService,
+)
+
+# Case-insensitive insurer name -> service; unmatched names fall back to DefaultInsurerService
+_INSURER_REGISTRY = {
+    service.insurer_name.lower(): service
+    for service in (PasargadInsurerService, HekmatInsurerService)
+    if getattr(service, 'insurer_name', None)
+}
+
+
+def _raise_save_error(error):
+    """
+    Re-raise a service ValidationError.
+    Duplicate IDs become non-field errors, the shape the pre-save checks they replace had.
+    """
+    if getattr(error, 'code', None) == DUPLICATE_ID:
+        raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: error.messages}) from error
+    raise error
+
+
+class InsuredDataListSerializer(serializers.ListSerializer):
+    """
+    List serializer used for many=True.
+    Groups payloads by insurer service and saves each group with bulk INSERTs.
+    """
+    # Keys that must not repeat within a batch, with the error reported on the repeating item
+    batch_unique_keys = (
+        (('policy_id',), _('This policy ID appears earlier in the batch.')),
+        (('plan_id',), _('This plan ID appears earlier in the batch.')),
+        (('insured_id',), _('This insured status ID appears earlier in the batch.')),
+        (('national_id', 'insurer_id', 'policyholder_id', 'start_date'),
+         _('A policy for this person, insurer, policyholder, and start date appears earlier in the batch.')),
+    )
+
+    def to_internal_value(self, data):
+        """Validate each item, then reject repeated keys so that the error points at the item."""
+        items = super().to_internal_value(data)
+        errors = [{} for _item in items]
+        for fields, message in self.batch_unique_keys:
+            seen = set()
+            for item, item_errors in zip(items, errors):
+                key = tuple(item.get(field) for field in fields)
+                if key in seen:
+                    item_errors.setdefault(api_settings.NON_FIELD_ERRORS_KEY, []).append(message)
+                seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        """Save all payloads in one transaction, preserving input order."""
+        groups = defaultdict(list)
+        for index, item in enumerate(validated_data):
+            service_class = self.child.get_insurer_service(item.get('insurer', ''))
+            groups[service_class].append((index, item))
+
+        try:
+            saved = BaseInsurerService.save_groups(
+                [(service_class, [item for _index, item in items]) for service_class, items in groups.items()])
+        except DjangoValidationError as e:
+            # The endpoint is new, so every save error gets the structured shape
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: e.messages}) from e
+
+        results = [None] * len(validated_data)
+        for items, group_results in zip(groups.values(), saved):
+            for (index, _item), result in zip(items, group_results):
+                results[index] = result
+        return results
+
+    def to_representation(self, data):
+        """Render saved results with the bound child; items are plain dicts, never managers."""
+        to_representation = self.child.to_representation
+        return [to_representation(item) for item in data]
 
 
 class BaseInsuredDataSerializer(serializers.Serializer):
@@ -12,22 +88,18 @@ class BaseInsuredDataSerializer(serializers.Serializer):
     """
     data = serializers.DictField(child=serializers.CharField(allow_blank=True), write_only=True)
 
-    # Response fields
-    personal_details = serializers.SerializerMethodField(read_only=True)
-    insurer_response = serializers.SerializerMethodField(read_only=True)
-    policyholder_response = serializers.SerializerMethodField(read_only=True)
-    policy_response = serializers.SerializerMethodField(read_only=True)
-    plan_response = serializers.SerializerMethodField(read_only=True)
-    insured_status_response = serializers.SerializerMethodField(read_only=True)
+    class Meta:
+        list_serializer_class = InsuredDataListSerializer
 
     def validate_data(self, value):
         """Validate phone_number and national_id formats if present."""
-        import re
         if 'phone_number' in value:
-            if not re.match(r'^09\d{9}$', value['phone_number']):
+            phone_number = value['phone_number']
+            if not (len(phone_number) == 11 and phone_number.startswith('09') and phone_number.isdecimal()):
                 raise serializers.ValidationError(_('Enter a valid Iranian mobile number.'))
         if 'national_id' in value:
-            if not re.match(r'^\d{10}$', value['national_id']):
+            national_id = value['national_id']
+            if not (len(national_id) == 10 and national_id.isdecimal()):
                 raise serializers.ValidationError(_('National ID must be exactly 10 digits.'))
         return value
 
@@ -37,20 +109,20 @@ class BaseInsuredDataSerializer(serializers.Serializer):
         insurer = payload.get('insurer', '')
         service_class = self.get_insurer_service(insurer)
 
-        # Validate mandatory fields
+        # Validate mandatory fields; the model field name is accepted in place of the input key
         missing_fields = []
         for model_field in service_class.mandatory_fields:
-            json_key = next((k for k, v in service_class.key_mapping.items() if v == model_field), None)
-            if json_key and json_key not in payload:
+            json_key = service_class.key_mapping.get(model_field)
+            if json_key and json_key not in payload and model_field not in payload:
                 missing_fields.append(json_key)
         if missing_fields:
-            raise serializers.ValidationError(_(f"Missing required fields: {', '.join(missing_fields)}"))
+            raise serializers.ValidationError(_('Missing required fields: %(fields)s') % {'fields': ', '.join(missing_fields)})
 
         # Transform payload to model field names
         transformed_data = {}
         for json_key, value in payload.items():
             # Find model field for the input key
-            model_field = next((k for k, v in service_class.key_mapping.items() if v == json_key), json_key)
+            model_field = service_class.inverse_key_mapping.get(json_key, json_key)
             transformed_data[model_field] = value
 
         # Additional validations
@@ -61,69 +133,62 @@ class BaseInsuredDataSerializer(serializers.Serializer):
             if transformed_data.get(
                 'confirmation_date') and transformed_data['confirmation_date'] < transformed_data['start_date']:
                 raise serializers.ValidationError(_('Confirmation date cannot be before start date.'))
-        if 'policy_id' in transformed_data and Policy.objects.filter(unique_id=transformed_data['policy_id']).exists():
-            raise serializers.ValidationError(_('A policy with this ID already exists.'))
-        if 'plan_id' in transformed_data and Plan.objects.filter(unique_id=transformed_data['plan_id']).exists():
-            raise serializers.ValidationError(_('A plan with this ID already exists.'))
-        if 'insured_id' in transformed_data and InsuredStatus.objects.filter(
-            unique_id=transformed_data['insured_id']).exists():
-            raise serializers.ValidationError(_('An insured status with this ID already exists.'))
 
         return transformed_data
 
-    def get_personal_details(self, obj):
-        """Return full name for response."""
-        return f"{obj['insured'].first_name} {obj['insured'].last_name}"
-
-    def get_insurer_response(self, obj):
-        """Return insurer name for response."""
-        return obj['insurer'].name
-
-    def get_policyholder_response(self, obj):
-        """Return policyholder name for response."""
-        return obj['policyholder'].name
-
-    def get_policy_response(self, obj):
-        """Return policy string for response."""
-        return str(obj['policy'])
-
-    def get_plan_response(self, obj):
-        """Return plan name for response."""
-        return obj['plan'].name
-
-    def get_insured_status_response(self, obj):
-        """Return insured status string for response."""
-        return str(obj['insured_status'])
-
     def create(self, validated_data):
         """Use appropriate insurer service to save data."""
         service_class = self.get_insurer_service(validated_data.get('insurer', ''))
         service = service_class(validated_data)
-        return service.save()
+        try:
+            return service.save()
+        except DjangoValidationError as e:
+            _raise_save_error(e)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Load the related rows a Policy response needs in three queries instead of several per row.
+        Meant for a future Policy read serializer: to_representation below renders save results,
+        not Policy instances, so nothing in this serializer calls it yet.
+        """
+        return queryset.select_related('insured', 'insurer', 'policyholder').prefetch_related(
+            'plans', 'insured_statuses')
 
     def get_insurer_service(self, insurer):
         """Select insurer service based on case-insensitive insurer name."""
-        services = [
-            PasargadInsurerService,
-            HekmatInsurerService,
-            DefaultInsurerService,  # Default last to ensure specific names take precedence
-        ]
-        for service in services:
-            if hasattr(service, 'insurer_name') and service.insurer_name:
-                if insurer.lower() == service.insurer_name.lower():
-                    return service
-        return DefaultInsurerService  # Fallback for unmatched or empty insurer
+        return _INSURER_REGISTRY.get((insurer or '').lower(), DefaultInsurerService)
 
     def to_representation(self, instance):
-        """Customize response format."""
+        """Customize response format. Policy and InsuredStatus __str__ are inlined."""
+        insured = instance['insured']
+        full_name = f"{insured.first_name} {insured.last_name}"
         return {
             'message': _('Data processed successfully'),
             'data': {
-                'personal_details': self.get_personal_details(instance),
-                'insurer': self.get_insurer_response(instance),
-                'policyholder': self.get_policyholder_response(instance),
-                'policy': self.get_policy_response(instance),
-                'plan': self.get_plan_response(instance),
-                'insured_status': self.get_insured_status_response(instance),
+                'personal_details': full_name,
+                'insurer': instance['insurer'].name,
+                'policyholder': instance['policyholder'].name,
+                'policy': f"Policy {instance['policy'].unique_id} for {full_name}",
+                'plan': instance['plan'].name,
+                'insured_status': f"Insured {instance['insured_status'].unique_id}",
             }
         }
+
+
+# Schema-only serializers: BaseInsuredDataSerializer builds its response in to_representation
+# and declares no readable fields, so the endpoints document their responses with these
+class InsuredDataDetailsSerializer(serializers.Serializer):
+    """Names and IDs of the saved records."""
+    personal_details = serializers.CharField()
+    insurer = serializers.CharField()
+    policyholder = serializers.CharField()
+    policy = serializers.CharField()
+    plan = serializers.CharField()
+    insured_status = serializers.CharField()
+
+
+class InsuredDataResponseSerializer(serializers.Serializer):
+    """Result of saving one insured data item."""
+    message = serializers.CharField()
+    data = InsuredDataDetailsSerializer()
@@ -1,10 +1,135 @@
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from .models import Insured, Insurer, Policyholder, Policy, Plan, InsuredStatus
-from django.db.utils import IntegrityError
+from django.db.utils import DatabaseError, IntegrityError
 from django.core.exceptions import ValidationError
 
+# SQLSTATEs reported by PostgreSQL drivers for unique_violation and foreign_key_violation
+UNIQUE_VIOLATION = '23505'
+FOREIGN_KEY_VIOLATION = '23503'
+
+# ValidationError code for duplicate policy, plan and insured status IDs
+DUPLICATE_ID = 'duplicate_id'
+
+# Reported when a policy repeats (insured, insurer, policyholder, start_date)
+DUPLICATE_POLICY_MESSAGE = _('A policy for this person, insurer, policyholder, and start date already exists.')
+
+# Rows per INSERT statement on bulk paths
+BULK_BATCH_SIZE = 500
+
+# Insured fields every service maps, and those a payload may leave out
+_INSURED_KEYS = ('first_name', 'last_name', 'phone_number', 'national_id', 'birth_date')
+_OPTIONAL_INSURED_KEYS = ('email', 'father_name', 'place_of_issue')
+
+
+def _is_violation(error, sqlstate, sqlite_message):
+    """Check the driver exception behind an IntegrityError instead of parsing its message."""
+    cause = error.__cause__
+    # psycopg2 exposes the SQLSTATE as pgcode, psycopg 3 as sqlstate
+    code = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    if code is not None:
+        return code == sqlstate
+    # sqlite3 has no error codes on the exception, only the message
+    return bool(getattr(cause, 'args', None)) and str(cause.args[0]).startswith(sqlite_message)
+
+
+def _is_unique_violation(error):
+    return _is_violation(error, UNIQUE_VIOLATION, 'UNIQUE constraint failed')
+
+
+def _is_foreign_key_violation(error):
+    return _is_violation(error, FOREIGN_KEY_VIOLATION, 'FOREIGN KEY constraint failed')
+
+
+def _upsert_many(model, unique_field, rows):
+    """
+    Insert rows, or update the rows with the same natural key (INSERT ... ON CONFLICT DO UPDATE),
+    and return {natural key: instance}. Repeated keys collapse to the last row. Rows are grouped
+    by the fields they carry so that missing optional fields never overwrite stored values.
+    """
+    latest = {row[unique_field]: row for row in rows}
+    groups = defaultdict(list)
+    for row in latest.values():
+        groups[tuple(row)].append(model(**row))
+
+    instances = {}
+    for fields, objs in groups.items():
+        model.objects.bulk_create(
+            objs,
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=[unique_field],
+            update_fields=[field for field in fields if field != unique_field] + ['updated_at'],
+        )
+        instances.update((getattr(obj, unique_field), obj) for obj in objs)
+
+    missing = [key for key, obj in instances.items() if obj.pk is None]
+    if missing:
+        # Backends without INSERT ... RETURNING: fetch only the pks, not the whole rows
+        pks = dict(model.objects.filter(**{f'{unique_field}__in': missing}).values_list(unique_field, 'pk'))
+        for key in missing:
+            instances[key].pk = pks[key]
+    return instances
+
+
+def _upsert(model, unique_field, values):
+    """Upsert a single row; the returned instance carries the stored pk."""
+    return _upsert_many(model, unique_field, [values])[values[unique_field]]
+
+
+# (model, unique_id) -> (pk, name) of the Insurer and Policyholder rows this process has written
+_named_rows = {}
+NAMED_ROWS_MAX = 512
+
+
+def _upsert_named(model, unique_id, name):
+    """
+    Return the pk of an Insurer or Policyholder, upserting the row unless this process
+    already wrote it with the same name. A changed name is written through, so the row
+    keeps the last name submitted, as Insured rows do.
+    """
+    key = (model, unique_id)
+    cached = _named_rows.get(key)
+    if cached is not None and cached[1] == name:
+        return cached[0]
+    pk = _upsert(model, 'unique_id', {'unique_id': unique_id, 'name': name}).pk
+    if len(_named_rows) >= NAMED_ROWS_MAX:
+        _named_rows.clear()
+    _named_rows[key] = (pk, name)
+    return pk
+
+
+def clear_named_cache():
+    """
+    Forget cached Insurer and Policyholder pks.
+    Called when a save fails and when these models are saved or deleted through the ORM.
+    """
+    _named_rows.clear()
+
+
+def _atomic(write):
+    """
+    Run write() in a transaction and return its result.
+    A cached Insurer or Policyholder pk whose row another worker deleted fails the foreign
+    key check, at COMMIT since the constraints are deferred. The cache is then cleared and
+    write() runs once more, upserting those rows again. Inside an enclosing transaction
+    nothing is retried; the outermost call does it.
+    """
+    if transaction.get_connection().in_atomic_block:
+        with transaction.atomic(savepoint=False):
+            return write()
+    try:
+        with transaction.atomic(savepoint=False):
+            return write()
+    except IntegrityError as e:
+        if not _is_foreign_key_violation(e):
+            raise
+        clear_named_cache()
+    with transaction.atomic(savepoint=False):
+        return write()
+
 
 class BaseInsurerService(ABC):
     """
@@ -12,116 +137,232 @@ class BaseInsurerService(ABC):
     Enforces persistence and creation order.
     Subclasses define key mappings, mandatory fields, and insurer name for service selection.
     """
+    # No per-instance __dict__; subclasses declare empty __slots__ to keep it that way
+    __slots__ = ('data', '_mapped_data')
+
+    def __init_subclass__(cls, **kwargs):
+        """Precompute key lookups for each service."""
+        super().__init_subclass__(**kwargs)
+        key_mapping = getattr(cls, 'key_mapping', {})
+        # Model fields accepted by _map_keys
+        cls.allowed_fields = frozenset(key_mapping)
+        # Input key -> model field
+        cls.inverse_key_mapping = {v: k for k, v in key_mapping.items()}
+
     @abstractmethod
     def _map_keys(self, data):
         """Validate and return model field data."""
         pass
 
-    @transaction.atomic
+    @property
+    def mapped_data(self):
+        """Model field data, validated on first access rather than in __init__."""
+        try:
+            return self._mapped_data
+        except AttributeError:
+            self._mapped_data = self._map_keys(self.data)
+            return self._mapped_data
+
     def save(self):
         """
         Save data in strict order: Insured -> Insurer -> Policyholder -> Policy -> Plan -> InsuredStatus.
         Ensures all tables are populated.
         """
+        # Validate before writing; a malformed payload needs no rollback or cache cleanup
+        self.mapped_data
+        # The try wraps the transaction so that errors raised at COMMIT are handled too
+        try:
+            return _atomic(self._save_rows)
+        except Exception as e:
+            raise self._save_error(e)
+
+    def _save_rows(self):
+        """Write the rows of save(); runs inside its transaction."""
+        # 1. Save Insured
+        insured = self._save_insured()
+        # 2. Save Insurer
+        insurer = self._save_insurer()
+        # 3. Save Policyholder
+        policyholder = self._save_policyholder()
+        # 4. Save Policy
+        policy = self._save_policy(insured, insurer, policyholder)
+        # 5. Save Plan
+        plan = self._save_plan(policy)
+        # 6. Save InsuredStatus
+        insured_status = self._save_insured_status(policy)
+
+        return {
+            'insured': insured,
+            'insurer': insurer,
+            'policyholder': policyholder,
+            'policy': policy,
+            'plan': plan,
+            'insured_status': insured_status
+        }
+
+    @classmethod
+    def save_many(cls, payloads):
+        """
+        Save several payloads in one transaction.
+        Insured rows are deduplicated by national ID and upserted together, Insurer and
+        Policyholder go through the per-process cache, and Policy, Plan and InsuredStatus
+        are written with bulk INSERTs of up to BULK_BATCH_SIZE rows.
+        """
+        services = [cls(payload) for payload in payloads]
+        # Validate every payload before writing, as save() does
+        for service in services:
+            service.mapped_data
         try:
-            # 1. Save Insured
-            insured = self._save_insured()
-            # 2. Save Insurer
-            insurer = self._save_insurer()
-            # 3. Save Policyholder
-            policyholder = self._save_policyholder()
-            # 4. Save Policy
-            policy = self._save_policy(insured, insurer, policyholder)
-            # 5. Save Plan
-            plan = self._save_plan(policy)
-            # 6. Save InsuredStatus
-            insured_status = self._save_insured_status(policy)
-
-            return {
+            return _atomic(lambda: cls._save_many_rows(services))
+        except Exception as e:
+            raise cls._save_error(e)
+
+    @staticmethod
+    def _save_many_rows(services):
+        """Write the rows of save_many(); runs inside its transaction."""
+        insureds = _upsert_many(Insured, 'national_id', [service._insured_data() for service in services])
+        results = []
+        for service in services:
+            insured = insureds[service.mapped_data['national_id']]
+            insurer = service._save_insurer()
+            policyholder = service._save_policyholder()
+            results.append({
                 'insured': insured,
                 'insurer': insurer,
                 'policyholder': policyholder,
-                'policy': policy,
-                'plan': plan,
-                'insured_status': insured_status
-            }
-        except IntegrityError as e:
-            if 'unique constraint' in str(e).lower():
-                raise ValidationError(
-                    _('A policy for this person, insurer, policyholder, and start date already exists.'))
-            raise ValidationError(_(f"Database error: {str(e)}"))
+                'policy': service._build_policy(insured, insurer, policyholder),
+            })
+        policies = Policy.objects.bulk_create(
+            [result['policy'] for result in results], batch_size=BULK_BATCH_SIZE)
+        if any(policy.pk is None for policy in policies):
+            # Backends without INSERT ... RETURNING: resolve pks by unique_id
+            pks = dict(Policy.objects.filter(
+                unique_id__in=[policy.unique_id for policy in policies]).values_list('unique_id', 'pk'))
+            for policy in policies:
+                policy.pk = pks[policy.unique_id]
+
+        for service, result in zip(services, results):
+            result['plan'] = service._build_plan(result['policy'])
+            result['insured_status'] = service._build_insured_status(result['policy'])
+        Plan.objects.bulk_create([result['plan'] for result in results], batch_size=BULK_BATCH_SIZE)
+        InsuredStatus.objects.bulk_create(
+            [result['insured_status'] for result in results], batch_size=BULK_BATCH_SIZE)
+
+        return results
+
+    @staticmethod
+    def save_groups(groups):
+        """
+        Save the payloads of several services in one transaction.
+        groups is a list of (service class, payloads); returns the save_many() results in that order.
+        """
+        try:
+            return _atomic(lambda: [service_class.save_many(payloads) for service_class, payloads in groups])
         except Exception as e:
-            raise ValidationError(_(f"Failed to save data: {str(e)}"))
+            raise BaseInsurerService._save_error(e)
+
+    @classmethod
+    def _save_error(cls, error):
+        """Translate a failed save into a ValidationError."""
+        if isinstance(error, ValidationError):
+            # Already user-facing, e.g. from a nested save_many()
+            return error
+        if isinstance(error, DatabaseError):
+            # Cached pks may belong to rows this transaction created and rolled back
+            clear_named_cache()
+        if isinstance(error, IntegrityError):
+            if _is_unique_violation(error):
+                return cls._unique_violation_error(error)
+            return ValidationError(_('Database error: %(error)s') % {'error': error})
+        return ValidationError(_('Failed to save data: %(error)s') % {'error': error})
+
+    @staticmethod
+    def _unique_violation_error(error):
+        """
+        Map a unique constraint violation to a user-facing ValidationError.
+        Duplicate policy, plan and insured status IDs are reported by the database
+        instead of being checked up front, and carry the DUPLICATE_ID code.
+        """
+        diag = getattr(error.__cause__, 'diag', None)
+        if getattr(diag, 'table_name', None):
+            # psycopg reports the table and constraint directly, no message parsing needed
+            message = f'{diag.table_name} {diag.constraint_name or ""}'.lower()
+        else:
+            message = str(error).lower()
+        if Plan._meta.db_table in message:
+            return ValidationError(_('A plan with this ID already exists.'), code=DUPLICATE_ID)
+        if InsuredStatus._meta.db_table in message:
+            return ValidationError(_('An insured status with this ID already exists.'), code=DUPLICATE_ID)
+        if Policy._meta.db_table in message and 'unique_id' in message:
+            return ValidationError(_('A policy with this ID already exists.'), code=DUPLICATE_ID)
+        return ValidationError(DUPLICATE_POLICY_MESSAGE)
 
     def _save_insured(self):
         """Save Insured data."""
-        insured_data = {
-            'first_name': self.mapped_data['first_name'],
-            'last_name': self.mapped_data['last_name'],
-            'phone_number': self.mapped_data['phone_number'],
-            'national_id': self.mapped_data['national_id'],
-            'birth_date': self.mapped_data['birth_date'],
-        }
-        optional_fields = ['email', 'father_name', 'place_of_issue']
-        for field in optional_fields:
-            if field in self.mapped_data:
-                insured_data[field] = self.mapped_data[field]
-        return Insured.objects.get_or_create(
-            national_id=insured_data['national_id'],
-            defaults=insured_data
-        )[0]
+        return _upsert(Insured, 'national_id', self._insured_data())
+
+    def _insured_data(self):
+        """Return Insured field values from the mapped payload."""
+        md = self.mapped_data
+        insured_data = {field: md[field] for field in _INSURED_KEYS}
+        for field in _OPTIONAL_INSURED_KEYS:
+            if field in md:
+                insured_data[field] = md[field]
+        return insured_data
 
     def _save_insurer(self):
         """Save Insurer data."""
-        insurer_data = {
-            'name': self.mapped_data['insurer'],
-            'unique_id': self.mapped_data['insurer_id'],
-        }
-        return Insurer.objects.get_or_create(
-            unique_id=insurer_data['unique_id'],
-            defaults={'name': insurer_data['name']}
-        )[0]
+        md = self.mapped_data
+        unique_id = md['insurer_id']
+        name = md['insurer']
+        return Insurer(pk=_upsert_named(Insurer, unique_id, name), unique_id=unique_id, name=name)
 
     def _save_policyholder(self):
         """Save Policyholder data."""
-        policyholder_data = {
-            'name': self.mapped_data['policyholder_name'],
-            'unique_id': self.mapped_data['policyholder_id'],
-        }
-        return Policyholder.objects.get_or_create(
-            unique_id=policyholder_data['unique_id'],
-            defaults={'name': policyholder_data['name']}
-        )[0]
+        md = self.mapped_data
+        unique_id = md['policyholder_id']
+        name = md['policyholder_name']
+        return Policyholder(pk=_upsert_named(Policyholder, unique_id, name), unique_id=unique_id, name=name)
 
     def _save_policy(self, insured, insurer, policyholder):
         """Save Policy data."""
-        policy_data = {
-            'unique_id': self.mapped_data['policy_id'],
-            'insured': insured,
-            'insurer': insurer,
-            'policyholder': policyholder,
-            'start_date': self.mapped_data['start_date'],
-            'end_date': self.mapped_data['end_date'],
-            'confirmation_date': self.mapped_data.get('confirmation_date'),
-        }
-        return Policy.objects.create(**policy_data)
+        policy = self._build_policy(insured, insurer, policyholder)
+        policy.save(force_insert=True)
+        return policy
+
+    def _build_policy(self, insured, insurer, policyholder):
+        """Build an unsaved Policy."""
+        md = self.mapped_data
+        return Policy(
+            unique_id=md['policy_id'],
+            insured=insured,
+            insurer_id=insurer.pk,
+            policyholder_id=policyholder.pk,
+            start_date=md['start_date'],
+            end_date=md['end_date'],
+            confirmation_date=md.get('confirmation_date'),
+        )
 
     def _save_plan(self, policy):
         """Save Plan data."""
-        plan_data = {
-            'policy': policy,
-            'name': self.mapped_data['plan_name'],
-            'unique_id': self.mapped_data['plan_id'],
-        }
-        return Plan.objects.create(**plan_data)
+        plan = self._build_plan(policy)
+        plan.save(force_insert=True)
+        return plan
+
+    def _build_plan(self, policy):
+        """Build an unsaved Plan."""
+        md = self.mapped_data
+        return Plan(policy=policy, name=md['plan_name'], unique_id=md['plan_id'])
 
     def _save_insured_status(self, policy):
         """Save InsuredStatus data."""
-        insured_status_data = {
-            'policy': policy,
-            'unique_id': self.mapped_data['insured_id'],
-        }
-        return InsuredStatus.objects.create(**insured_status_data)
+        insured_status = self._build_insured_status(policy)
+        insured_status.save(force_insert=True)
+        return insured_status
+
+    def _build_insured_status(self, policy):
+        """Build an unsaved InsuredStatus."""
+        return InsuredStatus(policy=policy, unique_id=self.mapped_data['insured_id'])
 
 
 class DefaultInsurerService(BaseInsurerService):
@@ -129,6 +370,8 @@ class DefaultInsurerService(BaseInsurerService):
     Default service for insurers.
     Uses exact model field names with minimal mandatory fields.
     """
+    __slots__ = ()
+
     insurer_name = None  # Matches any unmatched insurer name
 
     key_mapping = {
@@ -153,7 +396,7 @@ class DefaultInsurerService(BaseInsurerService):
         'insured_id': 'insured_id',
     }
 
-    mandatory_fields = {
+    mandatory_fields = frozenset({
         'insurer',
         'first_name',
         'last_name',
@@ -169,20 +412,17 @@ class DefaultInsurerService(BaseInsurerService):
         'plan_name',
         'plan_id',
         'insured_id',
-    }
+    })
 
     def __init__(self, data):
         self.data = data or {}
-        self.mapped_data = self._map_keys(data)
 
     def _map_keys(self, data):
         """Validate model field data."""
-        mapped = {}
-        for model_field in self.key_mapping.keys():
-            if model_field in data:
-                mapped[model_field] = data[model_field]
-            elif model_field in self.mandatory_fields:
-                raise ValidationError(_(f"Missing required field: {model_field}"))
+        mapped = {field: data[field] for field in data.keys() & self.allowed_fields}
+        missing = self.mandatory_fields - mapped.keys()
+        if missing:
+            raise ValidationError(_('Missing required fields: %(fields)s') % {'fields': ', '.join(sorted(missing))})
         return mapped
 
 
@@ -191,6 +431,8 @@ class PasargadInsurerService(BaseInsurerService):
     Service for Pasargad insurer.
     Uses specific key mappings and requires email.
     """
+    __slots__ = ()
+
     insurer_name = "pasargad"  # Case-insensitive match
 
     key_mapping = {
@@ -215,7 +457,7 @@ class PasargadInsurerService(BaseInsurerService):
         'insured_id': 'insured_id',
     }
 
-    mandatory_fields = {
+    mandatory_fields = frozenset({
         'insurer',
         'first_name',
         'last_name',
@@ -232,20 +474,17 @@ class PasargadInsurerService(BaseInsurerService):
         'plan_name',
         'plan_id',
         'insured_id',
-    }
+    })
 
     def __init__(self, data):
         self.data = data or {}
-        self.mapped_data = self._map_keys(data)
 
     def _map_keys(self, data):
         """Validate model field data."""
-        mapped = {}
-        for model_field in self.key_mapping.keys():
-            if model_field in data:
-                mapped[model_field] = data[model_field]
-            elif model_field in self.mandatory_fields:
-                raise ValidationError(_(f"Missing required field: {model_field}"))
+        mapped = {field: data[field] for field in data.keys() & self.allowed_fields}
+        missing = self.mandatory_fields - mapped.keys()
+        if missing:
+            raise ValidationError(_('Missing required fields: %(fields)s') % {'fields': ', '.join(sorted(missing))})
         return mapped
 
 
@@ -254,6 +493,8 @@ class HekmatInsurerService(BaseInsurerService):
     Service for Hekmat insurer.
     Uses 'name'/'family_name' for input, mapped to model fields by serializer.
     """
+    __slots__ = ()
+
     insurer_name = "hekmat"  # Case-insensitive match
 
     key_mapping = {
@@ -278,7 +519,7 @@ class HekmatInsurerService(BaseInsurerService):
         'insured_id': 'insured_id',
     }
 
-    mandatory_fields = {
+    mandatory_fields = frozenset({
         'insurer',
         'first_name',
         'last_name',
@@ -294,18 +535,15 @@ class HekmatInsurerService(BaseInsurerService):
         'plan_name',
         'plan_id',
         'insured_id',
-    }
+    })
 
     def __init__(self, data):
         self.data = data or {}
-        self.mapped_data = self._map_keys(data)
 
     def _map_keys(self, data):
         """Validate model field data."""
-        mapped = {}
-        for model_field in self.key_mapping.keys():
-            if model_field in data:
-                mapped[model_field] = data[model_field]
-            elif model_field in self.mandatory_fields:
-                raise ValidationError(_(f"Missing required field: {model_field}"))
+        mapped = {field: data[field] for field in data.keys() & self.allowed_fields}
+        missing = self.mandatory_fields - mapped.keys()
+        if missing:
+            raise ValidationError(_('Missing required fields: %(fields)s') % {'fields': ', '.join(sorted(missing))})
         return mapped
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Insurer, Policyholder
+from .services import clear_named_cache
+
+
+@receiver([post_save, post_delete], sender=Insurer)
+@receiver([post_save, post_delete], sender=Policyholder)
+def forget_named_rows(sender, **kwargs):
+    """Drop cached insurer/policyholder lookups when one of them changes."""
+    clear_named_cache()
@@ -1,3 +1,198 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from .models import Insurer, InsuredStatus, Plan, Policy
+from .services import clear_named_cache
+from .views import BULK_MAX_ITEMS
 
-# Create your tests here.
+
+def make_payload(number, **overrides):
+    """Return a valid default-service payload whose IDs are unique per number."""
+    payload = {
+        'insurer': 'generic',
+        'first_name': 'Ali',
+        'last_name': 'Rezaei',
+        'phone_number': '09123456789',
+        'national_id': f'{1234567800 + number}',
+        'birth_date': '1990-01-01',
+        'insurer_id': 'GEN123',
+        'policyholder_name': 'Fanap',
+        'policyholder_id': 'FAN456',
+        'start_date': '2025-01-01',
+        'end_date': '2025-12-31',
+        'policy_id': f'POL{number}',
+        'plan_name': 'Silver',
+        'plan_id': f'PLN{number}',
+        'insured_id': f'INS{number}',
+    }
+    payload.update(overrides)
+    return payload
+
+
+class InsuredDataTestCase(TransactionTestCase):
+    """
+    Posts to the endpoint named by url_name.
+    Runs outside a test transaction: saves use savepoint=False, and COMMIT has to happen.
+    """
+    url_name = None
+
+    def setUp(self):
+        # The flush between tests bypasses signals, so start from an empty cache
+        clear_named_cache()
+        self.client = APIClient()
+        self.url = reverse(self.url_name)
+
+    def post(self, body, url=None):
+        return self.client.post(url or self.url, body, format='json')
+
+
+class NamedRowCacheTests(InsuredDataTestCase):
+    """Insurer and policyholder pks cached per process."""
+    url_name = 'insured-data'
+
+    def delete_insurer(self, unique_id):
+        """Delete behind the ORM so no signal clears the cache, as another worker would."""
+        with connection.cursor() as cursor:
+            for model in (Plan, InsuredStatus, Policy):
+                cursor.execute(f'DELETE FROM {model._meta.db_table}')
+            cursor.execute(f'DELETE FROM {Insurer._meta.db_table} WHERE unique_id = %s', [unique_id])
+
+    def test_latest_insurer_name_is_stored(self):
+        for number, name in enumerate(('Alpha', 'Beta', 'Alpha'), start=1):
+            response = self.post({'data': make_payload(number, insurer_id='Z1', insurer=name)})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['data']['insurer'], name)
+        self.assertEqual(Insurer.objects.get(unique_id='Z1').name, 'Alpha')
+
+    def test_recovers_after_cached_insurer_is_deleted(self):
+        self.assertEqual(self.post({'data': make_payload(1, insurer_id='Q1')}).status_code, status.HTTP_201_CREATED)
+        self.delete_insurer('Q1')
+        # The stale pk fails the foreign key check; the save is retried with a fresh upsert
+        self.assertEqual(self.post({'data': make_payload(2, insurer_id='Q1')}).status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Insurer.objects.filter(unique_id='Q1').exists())
+
+    def test_bulk_recovers_after_cached_insurer_is_deleted(self):
+        self.assertEqual(self.post({'data': make_payload(1, insurer_id='Q1')}).status_code, status.HTTP_201_CREATED)
+        self.delete_insurer('Q1')
+        response = self.post({'data': [make_payload(2, insurer_id='Q1')]}, reverse('insured-data-bulk'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Policy.objects.filter(insurer__unique_id='Q1').count(), 1)
+
+
+class InsuredDataViewTests(InsuredDataTestCase):
+    url_name = 'insured-data'
+
+    def test_creates_all_rows(self):
+        response = self.post({'data': make_payload(1)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['policy'], 'Policy POL1 for Ali Rezaei')
+        self.assertTrue(Plan.objects.filter(unique_id='PLN1', policy__unique_id='POL1').exists())
+        self.assertTrue(InsuredStatus.objects.filter(unique_id='INS1', policy__unique_id='POL1').exists())
+
+    def test_duplicate_ids_are_non_field_errors(self):
+        self.post({'data': make_payload(1)})
+        cases = (
+            ({'plan_id': 'PLN1'}, 'A plan with this ID already exists.'),
+            ({'insured_id': 'INS1'}, 'An insured status with this ID already exists.'),
+            ({'policy_id': 'POL1'}, 'A policy with this ID already exists.'),
+        )
+        for number, (overrides, message) in enumerate(cases, start=2):
+            with self.subTest(message=message):
+                response = self.post({'data': make_payload(number, **overrides)})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.json(), {'error': {'non_field_errors': [message]}})
+
+    def test_duplicate_natural_key_is_rejected(self):
+        self.post({'data': make_payload(1)})
+        # Same person, insurer, policyholder and start date under new IDs
+        response = self.post({'data': make_payload(2, national_id=make_payload(1)['national_id'])})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('A policy for this person, insurer, policyholder, and start date already exists.',
+                      response.json()['error'])
+        self.assertEqual(Policy.objects.count(), 1)
+
+    def test_hekmat_accepts_both_name_keys(self):
+        hekmat = make_payload(1, insurer='HEKMAT')
+        hekmat['name'] = hekmat.pop('first_name')
+        hekmat['family_name'] = hekmat.pop('last_name')
+        cases = (
+            ('name/family_name', hekmat),
+            ('first_name/last_name', make_payload(2, insurer='HEKMAT')),
+        )
+        for keys, payload in cases:
+            with self.subTest(keys=keys):
+                response = self.post({'data': payload})
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(response.data['data']['personal_details'], 'Ali Rezaei')
+
+    def test_hekmat_requires_a_name(self):
+        payload = make_payload(1, insurer='HEKMAT')
+        del payload['first_name']
+        response = self.post({'data': payload})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': {'non_field_errors': ['Missing required fields: name']}})
+
+
+class InsuredDataBulkViewTests(InsuredDataTestCase):
+    url_name = 'insured-data-bulk'
+
+    def test_creates_items_in_input_order(self):
+        items = [make_payload(number) for number in range(3)]
+        # Same person twice with another start date: one Insured row, holding the last name sent
+        items.append(make_payload(3, national_id=items[0]['national_id'], first_name='Reza', start_date='2025-02-01'))
+        response = self.post({'data': items})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['data']['policy'] for item in response.data],
+            ['Policy POL0 for Reza Rezaei', 'Policy POL1 for Ali Rezaei', 'Policy POL2 for Ali Rezaei',
+             'Policy POL3 for Reza Rezaei'],
+        )
+        self.assertEqual(Policy.objects.count(), 4)
+
+    def test_duplicate_in_batch_is_reported_on_the_item(self):
+        items = [make_payload(0), make_payload(1), make_payload(2, plan_id='PLN0')]
+        response = self.post({'data': items})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': [
+            {}, {}, {'non_field_errors': ['This plan ID appears earlier in the batch.']},
+        ]})
+        self.assertFalse(Policy.objects.exists())
+
+    def test_duplicate_of_stored_row_rejects_batch(self):
+        self.post({'data': [make_payload(0)]})
+        response = self.post({'data': [make_payload(1), make_payload(2, policy_id='POL0')]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': {'non_field_errors': ['A policy with this ID already exists.']}})
+        self.assertEqual(Policy.objects.count(), 1)
+
+    def test_natural_key_of_stored_policy_rejects_batch(self):
+        self.post({'data': [make_payload(0)]})
+        # Same person, insurer, policyholder and start date under new IDs
+        response = self.post({'data': [make_payload(1, national_id=make_payload(0)['national_id'])]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': {'non_field_errors': [
+            'A policy for this person, insurer, policyholder, and start date already exists.',
+        ]}})
+        self.assertEqual(Policy.objects.count(), 1)
+
+    def test_invalid_item_is_reported_on_the_item(self):
+        response = self.post({'data': [make_payload(0), make_payload(1, phone_number='123')]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': [{}, {'data': ['Enter a valid Iranian mobile number.']}]})
+
+    def test_bad_body(self):
+        expected = {'error': {'data': ['Expected a list of items.']}}
+        for body in ({'data': make_payload(0)}, {}, [make_payload(0)]):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.json(), expected)
+
+    def test_too_many_items(self):
+        response = self.post({'data': [{}] * (BULK_MAX_ITEMS + 1)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'error': {'non_field_errors': [
+            f'Ensure this field has no more than {BULK_MAX_ITEMS} elements.',
+        ]}})
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import InsuredDataView
+from .views import InsuredDataView, InsuredDataBulkView
 
 urlpatterns = [
     path('insured-data/', InsuredDataView.as_view(), name='insured-data'),
+    path('insured-data/bulk/', InsuredDataBulkView.as_view(), name='insured-data-bulk'),
 ]
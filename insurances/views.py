@@ -1,21 +1,55 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
 from django.utils.translation import gettext_lazy as _
-from .serializers import BaseInsuredDataSerializer
-from drf_spectacular.utils import extend_schema, OpenApiExample
+from .serializers import BaseInsuredDataSerializer, InsuredDataResponseSerializer
+from drf_spectacular.utils import extend_schema, inline_serializer, OpenApiExample
 from django.core.exceptions import ValidationError
 
+# Most items InsuredDataBulkView accepts in one request
+BULK_MAX_ITEMS = 1000
 
-class InsuredDataView(APIView):
+
+class BaseInsuredDataView(APIView):
+    """Validation, saving and error responses shared by the insured data endpoints."""
+
+    def save_response(self, serializer):
+        """Validate and save the serializer, returning the response for the outcome."""
+        try:
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(
+                {'error': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except serializers.ValidationError as e:
+            return Response(
+                {'error': e.detail},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValidationError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {'error': _('An unexpected error occurred: %(error)s') % {'error': e}},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class InsuredDataView(BaseInsuredDataView):
     """
     API endpoint to process insured person data.
     Uses a generic serializer with insurer-specific services.
+    The service wraps its writes in its own transaction, so ATOMIC_REQUESTS is not required.
     """
     @extend_schema(
         request=BaseInsuredDataSerializer,
         responses={
-            201: BaseInsuredDataSerializer,
+            201: InsuredDataResponseSerializer,
             400: {
                 'type': 'object',
                 'properties': {
@@ -97,27 +131,43 @@ class InsuredDataView(APIView):
                         'insured_id': 'INS203',
                     }
                 },
-                description='Valid payload for Hekmat (insurer name: "hekmat" case-insensitive, uses name/family_name, email optional).'
+                description='Valid payload for Hekmat (insurer name: "hekmat" case-insensitive, uses name/family_name, also accepts first_name/last_name, email optional).'
             ),
         ],
     )
     def post(self, request, *args, **kwargs):
-        try:
-            serializer = BaseInsuredDataSerializer(data=request.data)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            return Response(
-                {'error': serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        except ValidationError as e:
+        return self.save_response(BaseInsuredDataSerializer(data=request.data))
+
+
+class InsuredDataBulkView(BaseInsuredDataView):
+    """
+    API endpoint to process a batch of insured person data.
+    Accepts the same items as InsuredDataView and saves them with bulk inserts in one transaction.
+    """
+    @extend_schema(
+        request=inline_serializer(
+            name='InsuredDataBulkRequest',
+            fields={'data': serializers.ListField(child=serializers.DictField(child=serializers.CharField()))},
+        ),
+        responses={
+            201: InsuredDataResponseSerializer(many=True),
+            400: {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'object'},
+                },
+            },
+        },
+        description=f'Process a list of up to {BULK_MAX_ITEMS} insured data items. Each item is validated with the field mappings '
+                    'of its own insurer; the whole batch is saved or rejected together. Validation errors are '
+                    'listed per item, in input order.',
+    )
+    def post(self, request, *args, **kwargs):
+        items = request.data.get('data') if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
             return Response(
-                {'error': str(e)},
+                {'error': {'data': [_('Expected a list of items.')]}},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
-            return Response(
-                {'error': _('An unexpected error occurred: ') + str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return self.save_response(BaseInsuredDataSerializer(
+            data=[{'data': item} for item in items], many=True, max_length=BULK_MAX_ITEMS))
@@ -1,16 +1,16 @@
 from rest_framework.permissions import BasePermission
-from store.models import Staff
 from payment.models import Rental
 from films.models import Inventory
 
 
 class HasStoreStaffAccessRental(BasePermission):
     def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated and request.user.is_store_staff):
+            return False
         try:
-            staff = Staff.objects.get(user__id=request.user.id)
-            rental = Rental.objects.get(rental_id=view.kwargs.get('pk'))
-            return request.user and request.user.is_authenticated and request.user.is_store_staff and staff.staff_id == rental.staff.staff_id
-        except:
+            return Rental.objects.filter(rental_id=view.kwargs.get('pk'), staff__user_id=request.user.id).exists()
+        except (TypeError, ValueError):
+            # Malformed pk in the URL
             return False
 
 
@@ -1,24 +1,49 @@
 from django.core.exceptions import ValidationError
 from datetime import datetime
+from functools import lru_cache
 from django.core import exceptions
 
+DATE_FORMAT = '%Y-%m-%d'                    # 2025-03-08
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'       # 2025-03-08 14:30:00
+ISO_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'   # 2025-03-08T14:30:00 (ISO format)
+DATE_FORMATS = (DATE_FORMAT, DATETIME_FORMAT, ISO_DATETIME_FORMAT)
+
 
 def only_int(value):
-    if value.isdigit() == False:
+    if not value.isdigit():
         raise ValidationError('NationalID contains characters')
 
 
-def valid_date_format(date_str):
-    """Try parsing date string with multiple formats"""
-    DATE_FORMATS = [
-        '%Y-%m-%d',              # 2025-03-08
-        '%Y-%m-%d %H:%M:%S',     # 2025-03-08 14:30:00
-        '%Y-%m-%dT%H:%M:%S',     # 2025-03-08T14:30:00 (ISO format)
-    ]
-    for date_format in DATE_FORMATS:
+def _is_iso_shaped(date_str):
+    """True for zero-padded YYYY-MM-DD and YYYY-MM-DD[Tt ]HH:MM:SS strings."""
+    length = len(date_str)
+    if length != 10 and length != 19:
+        return False
+    if date_str[4] != '-' or date_str[7] != '-':
+        return False
+    return length == 10 or (date_str[10] in 'Tt ' and date_str[13] == ':' and date_str[16] == ':')
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_str):
+    """Parse with the one supported format the string can match; raises ValueError otherwise."""
+    if _is_iso_shaped(date_str):
+        # C-implemented fast path for the common, zero-padded forms
         try:
-            formatted_date = datetime.strptime(date_str, date_format)
-            return
+            return datetime.fromisoformat(date_str)
         except ValueError:
-            continue
-    raise exceptions.ValidationError(f'Invalid date format. Supported formats: {", ".join(DATE_FORMATS)}')
+            pass
+    # strptime matches the literal T case-insensitively
+    if 'T' in date_str or 't' in date_str:
+        return datetime.strptime(date_str, ISO_DATETIME_FORMAT)
+    if ':' in date_str:
+        return datetime.strptime(date_str, DATETIME_FORMAT)
+    return datetime.strptime(date_str, DATE_FORMAT)
+
+
+def valid_date_format(date_str):
+    """Try parsing date string with multiple formats"""
+    try:
+        _parse_date(date_str)
+    except ValueError:
+        raise exceptions.ValidationError(f'Invalid date format. Supported formats: {", ".join(DATE_FORMATS)}')